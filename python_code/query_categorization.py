@@ -2,138 +2,184 @@ import csv
 import re
 import sys
 import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from bisect import bisect_left
 
-def score_query(query):
-    score = 0
-    
-    if not re.search(r'SELECT \*', query, re.IGNORECASE):
-        score += 1
-    if re.search(r'LIMIT', query, re.IGNORECASE):
-        score += 1
-    if re.search(r'WHERE', query, re.IGNORECASE):
-        score += 2
-    if re.search(r'HAVING', query, re.IGNORECASE):
-        score += 2
-    if re.search(r'ORDER BY', query, re.IGNORECASE):
-        score += 1
-    joins = len(re.findall(r'JOIN', query, re.IGNORECASE))
-    score += joins * 3
-    if re.search(r'GROUP BY', query, re.IGNORECASE):
-        score += 2
-    aggregations = len(re.findall(r'(COUNT|SUM|AVG|MAX|MIN)\s*\(', query, re.IGNORECASE))
-    score += min(aggregations, 1) * 2 + max(aggregations - 1, 0)
-    subqueries = len(re.findall(r'\(SELECT', query, re.IGNORECASE))
-    score += subqueries * 3
-    if re.search(r'WITH', query, re.IGNORECASE):
-        score += 5
-    if re.search(r'(UNION|INTERSECT|EXCEPT)', query, re.IGNORECASE):
-        score += 5
-    if re.search(r'OVER\s*\(', query, re.IGNORECASE):
-        score += 6
-    if re.search(r'(PIVOT|UNPIVOT)', query, re.IGNORECASE):
-        score += 6
+from query_table_capture import WRITE_BUFFER_SIZE, read_chunks
 
-    return score
+# UPDATED: Set paths for new folder structure (resolved once at import)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CURATED_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "curated_output")
 
-def categorize_query(score):
-    if score <= 2:
-        return "Basic Exploratory"
-    elif score <= 6:
-        return "Focused Exploratory"
-    elif score <= 13:
-        return "Analytical"
-    else:
-        return "Complex Analytical"
+# Most clauses are plain keywords and are matched as substrings of the upper-cased
+# query; only the checks that need "optional whitespace then (" stay as regexes.
+# Both run against the upper-cased copy, so no IGNORECASE flag is needed.
+_RE_AGG = re.compile(r'(?:COUNT|SUM|AVG|MAX|MIN)\s*\(')
+_RE_OVER = re.compile(r'OVER\s*\(')
 
-def explain_score(query):
+# Same SQL text is often logged many times (re-runs, scheduled queries), so memoize by query
+@functools.lru_cache(maxsize=65536)
+def analyze_query(query):
+    # Single pass over the clauses: returns (score, explanation) together
+    if len(query) < 4:
+        # Shorter than every clause keyword (JOIN, WITH, SUM( ...): only the no-SELECT-* point applies
+        return 1, "SELECT with specific columns (1)"
+    q = query.upper()
+    score = 0
     explanations = []
-    if not re.search(r'SELECT \*', query, re.IGNORECASE):
+
+    if 'SELECT *' not in q:
+        score += 1
         explanations.append("SELECT with specific columns (1)")
-    if re.search(r'LIMIT', query, re.IGNORECASE):
+    if 'LIMIT' in q:
+        score += 1
         explanations.append("LIMIT clause (1)")
-    if re.search(r'WHERE', query, re.IGNORECASE):
+    if 'WHERE' in q:
+        score += 2
         explanations.append("WHERE clause (2)")
-    if re.search(r'HAVING', query, re.IGNORECASE):
+    if 'HAVING' in q:
+        score += 2
         explanations.append("HAVING clause (2)")
-    if re.search(r'ORDER BY', query, re.IGNORECASE):
+    if 'ORDER BY' in q:
+        score += 1
         explanations.append("ORDER BY (1)")
-    joins = len(re.findall(r'JOIN', query, re.IGNORECASE))
+    joins = q.count('JOIN')
     if joins > 0:
+        score += joins * 3
         explanations.append(f"JOIns ({joins * 3})")
-    if re.search(r'GROUP BY', query, re.IGNORECASE):
+    if 'GROUP BY' in q:
+        score += 2
         explanations.append("GROUP BY (2)")
-    aggregations = len(re.findall(r'(COUNT|SUM|AVG|MAX|MIN)\s*\(', query, re.IGNORECASE))
+    aggregations = len(_RE_AGG.findall(q))
     if aggregations > 0:
-        explanations.append(f"Aggregations ({min(aggregations, 1) * 2 + max(aggregations - 1, 0)})")
-    subqueries = len(re.findall(r'\(SELECT', query, re.IGNORECASE))
+        aggregation_points = min(aggregations, 1) * 2 + max(aggregations - 1, 0)
+        score += aggregation_points
+        explanations.append(f"Aggregations ({aggregation_points})")
+    subqueries = q.count('(SELECT')
     if subqueries > 0:
+        score += subqueries * 3
         explanations.append(f"Subqueries ({subqueries * 3})")
-    if re.search(r'WITH', query, re.IGNORECASE):
+    if 'WITH' in q:
+        score += 5
         explanations.append("Common Table Expressions (5)")
-    if re.search(r'(UNION|INTERSECT|EXCEPT)', query, re.IGNORECASE):
+    if 'UNION' in q or 'INTERSECT' in q or 'EXCEPT' in q:
+        score += 5
         explanations.append("Set operations (5)")
-    if re.search(r'OVER\s*\(', query, re.IGNORECASE):
+    if _RE_OVER.search(q):
+        score += 6
         explanations.append("Window functions (6)")
-    if re.search(r'(PIVOT|UNPIVOT)', query, re.IGNORECASE):
+    if 'PIVOT' in q:
+        # also covers UNPIVOT
+        score += 6
         explanations.append("PIVOT/UNPIVOT (6)")
-    return ", ".join(explanations)
+
+    return score, ", ".join(explanations)
+
+# Upper score bound (inclusive) of each category; anything above the last is Complex Analytical
+_CATEGORY_BOUNDS = [2, 6, 13]
+_CATEGORY_LABELS = ["Basic Exploratory", "Focused Exploratory", "Analytical", "Complex Analytical"]
+
+def categorize_query(score):
+    return _CATEGORY_LABELS[bisect_left(_CATEGORY_BOUNDS, score)]
+
+# Columns appended to the table capture output
+SCORE_FIELDNAMES = ['score', 'category', 'explanation']
+
+def categorize_columns(header):
+    # Resolve the positions of the query and completeness columns once from the header
+    completeness_i = header.index('completeness') if 'completeness' in header else None
+    return header.index('query'), completeness_i
+
+def categorize_row(row, columns):
+    # Appends score/category/explanation to a table-captured row (list, in place) and returns it
+    query_i, completeness_i = columns
+    query = row[query_i]
+    # str() so rows handed over in memory (int completeness) behave like CSV rows
+    completeness = str(row[completeness_i]) if completeness_i is not None else '1'
+    
+    if completeness == '1':
+        score, explanation = analyze_query(query)
+        category = categorize_query(score)
+    else:
+        score = 'N/A'
+        category = 'Invalid/Incomplete'
+        explanation = 'Query marked as incomplete'
+    
+    # UPDATED: New columns follow SCORE_FIELDNAMES order
+    row.extend((score, category, explanation))
+    return row
+
+# Inputs at least this large are scored across worker processes; for smaller
+# files the pool start-up costs more than it saves
+PARALLEL_MIN_BYTES = 64 << 20
+
+def categorize_chunk(rows, columns):
+    # Worker entry point: score one chunk of rows (must stay importable for ProcessPoolExecutor)
+    return [categorize_row(row, columns) for row in rows]
+
+def use_worker_pool(input_file):
+    # Only large inputs on multi-core machines are worth a process pool
+    return (os.cpu_count() or 1) > 1 and os.path.getsize(input_file) >= PARALLEL_MIN_BYTES
+
+def map_chunks(worker, chunks, *args, parallel=False):
+    # Yields worker(chunk, *args) for each chunk, in input order. With parallel=True the
+    # chunks run in a process pool with at most two per worker in flight, so memory stays
+    # bounded however large the input is (executor.map would submit the whole file up front).
+    if not parallel:
+        for chunk in chunks:
+            yield worker(chunk, *args)
+        return
+    
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(worker, chunk, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 def process_queries(input_file, output_file):
     with open(input_file, 'r', newline='', encoding='utf-8') as infile, \
-         open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        reader = csv.DictReader(infile)
+         open(output_file, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as outfile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        columns = categorize_columns(header)
         
         # UPDATED: Add new columns to existing fieldnames from table capture output
-        fieldnames = reader.fieldnames + ['score', 'category', 'explanation']
-        
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for row in reader:
-            # UPDATED: Use snake_case column names to match table capture output
-            query = row['query']
-            completeness = row.get('completeness', '1')
-            
-            if completeness == '1':
-                score = score_query(query)
-                category = categorize_query(score)
-                explanation = explain_score(query)
-            else:
-                score = 'N/A'
-                category = 'Invalid/Incomplete'
-                explanation = 'Query marked as incomplete'
-            
-            # UPDATED: Use snake_case for new columns
-            row['score'] = score
-            row['category'] = category
-            row['explanation'] = explanation
-            
-            writer.writerow(row)
+        writer = csv.writer(outfile)
+        writer.writerow(header + SCORE_FIELDNAMES)
+
+        # Rows are independent, so large inputs are scored across worker processes
+        for scored in map_chunks(categorize_chunk, read_chunks(reader), columns,
+                                 parallel=use_worker_pool(input_file)):
+            writer.writerows(scored)
 
     print(f"Processing complete. Results saved to {output_file}")
 
-if __name__ == "__main__":
-    # UPDATED: Set paths for new folder structure
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    curated_output_dir = os.path.join(project_root, "curated_output")
-    
-    if len(sys.argv) != 2:
-        print("Usage: python query_categorization.py <input_filename>")
-        print("Example: python query_categorization.py query_table_captured.csv")
-        sys.exit(1)
-    
-    input_filename = sys.argv[1]
+def main(input_filename):
     if not input_filename.endswith('.csv'):
         input_filename += '.csv'
     
     # UPDATED: Read from curated_output folder
-    input_file = os.path.join(curated_output_dir, input_filename)
-    output_file = os.path.join(curated_output_dir, "categorized_queries.csv")
+    input_file = os.path.join(CURATED_OUTPUT_DIR, input_filename)
+    output_file = os.path.join(CURATED_OUTPUT_DIR, "categorized_queries.csv")
     
     if not os.path.exists(input_file):
         print(f"File not found: {input_file}")
         print(f"Make sure you've run the table capture step first!")
         sys.exit(1)
     
-    process_queries(input_file, output_file)
\ No newline at end of file
+    process_queries(input_file, output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python query_categorization.py <input_filename>")
+        print("Example: python query_categorization.py query_table_captured.csv")
+        sys.exit(1)
+    
+    main(sys.argv[1])
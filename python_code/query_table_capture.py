@@ -2,25 +2,27 @@ import csv
 import re
 import sys
 import os
+import functools
+from itertools import islice
 
+# Set paths relative to script location (resolved once at import)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+RAW_DATA_DIR = os.path.join(PROJECT_ROOT, "raw_data")
+CURATED_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "curated_output")
+
+# CHANGE 1: Handle both legacy and Gridiron patterns (compiled once at import).
+# Kept as two independent scans so a match of one pattern can't swallow the other.
+_RE_LEGACY = re.compile(r'AwsDataCatalog\.[^.\s]+\.[^.\s]+_vw', re.IGNORECASE)  # Legacy: AwsDataCatalog.schema.table_vw
+_RE_GRIDIRON = re.compile(r'[a-zA-Z_]+_ptc\.[a-zA-Z_0-9]+', re.IGNORECASE)      # Gridiron: schema_ptc.table_name
+
+# Pure function of the query text; cached because identical queries repeat across rows.
+# Returns a tuple so the cached value can't be mutated by callers.
+@functools.lru_cache(maxsize=65536)
 def extract_tables(query):
-    # CHANGE 1: Updated to handle both legacy and Gridiron patterns
-    legacy_pattern = r'AwsDataCatalog\.[^.\s]+\.[^.\s]+_vw'  # Legacy: AwsDataCatalog.schema.table_vw
-    gridiron_pattern = r'[a-zA-Z_]+_ptc\.[a-zA-Z_0-9]+'     # Gridiron: schema_ptc.table_name
-    
-    legacy_tables = re.findall(legacy_pattern, query, re.IGNORECASE)
-    gridiron_tables = re.findall(gridiron_pattern, query, re.IGNORECASE)
-    
-    # CHANGE 2: Combine both types and preserve order
-    all_tables = []
-    
-    # Add legacy tables with their full names
-    for table in legacy_tables:
-        all_tables.append(('legacy', table))
-    
-    # Add gridiron tables with their full names  
-    for table in gridiron_tables:
-        all_tables.append(('gridiron', table))
+    # CHANGE 2: Combine both types, legacy tables first, each in query order
+    all_tables = [('legacy', table) for table in _RE_LEGACY.findall(query)]
+    all_tables += [('gridiron', table) for table in _RE_GRIDIRON.findall(query)]
     
     # Remove duplicates while preserving order
     seen = set()
@@ -30,8 +32,7 @@ def extract_tables(query):
             unique_tables.append((env_type, table))
             seen.add(table)
     
-    print(f"Tables found: {unique_tables}")
-    return unique_tables
+    return tuple(unique_tables)
 
 def is_query_complete(table_info_list):
     # CHANGE 3: Updated to work with new tuple structure (environment, table)
@@ -41,12 +42,12 @@ def get_simplified_table_name(table, environment):
     # CHANGE 4: Enhanced to handle both environments differently
     if environment == 'legacy':
         # Legacy: Remove AwsDataCatalog prefix and _vw suffix
-        table_name = table.split('.')[-1]  # Get the last part after dots
-        table_name = table_name.replace('_vw', '')  # Remove _vw suffix
+        table_name = table.rpartition('.')[2]  # Get the last part after dots
+        table_name = table_name.removesuffix('_vw')  # Remove _vw suffix
         # Remove club code (last part after underscore)
-        parts = table_name.split('_')
-        if len(parts) > 1:
-            table_name = '_'.join(parts[:-1])
+        head, sep, _ = table_name.rpartition('_')
+        if sep:
+            table_name = head
         return table_name
     else:  # gridiron
         # Gridiron: Extract table name after schema (remove schema_ptc. prefix)
@@ -64,91 +65,108 @@ def determine_primary_environment(table_info_list, completeness):
     if not table_info_list:
         return 'unknown'
     
-    env_counts = {'legacy': 0, 'gridiron': 0}
-    for env_type, _ in table_info_list:
-        env_counts[env_type] += 1
+    # Every entry is either legacy or gridiron, so one count gives both
+    legacy = sum(1 for env_type, _ in table_info_list if env_type == 'legacy')
+    gridiron = len(table_info_list) - legacy
     
     # Return the environment with more tables, or 'mixed' if equal
-    if env_counts['legacy'] > env_counts['gridiron']:
+    if legacy > gridiron:
         return 'legacy'
-    elif env_counts['gridiron'] > env_counts['legacy']:
+    elif gridiron > legacy:
         return 'gridiron'
     else:
-        return 'mixed' if env_counts['legacy'] > 0 and env_counts['gridiron'] > 0 else 'legacy'
+        return 'mixed' if legacy > 0 else 'legacy'
+
+# CHANGE 6: Updated fieldnames with underscore convention and extended to 6 tables
+FIELDNAMES = ['timestamp_et', 'user', 'club', 'query', 'table_used', 'completeness', 
+              'first_table_used', 'second_table_used', 'third_table_used', 
+              'fourth_table_used', 'fifth_table_used', 'sixth_table_used',
+              'table_used_num', 'data_environment']
+
+# Raw query-log columns read by capture_row, in the order capture_columns() returns them
+RAW_COLUMNS = ['Timestamp (ET)', 'User', 'Club', 'Query']
+
+def capture_columns(header):
+    # Resolve the positions of RAW_COLUMNS once from the raw CSV header (None if a column is missing)
+    return [header.index(name) if name in header else None for name in RAW_COLUMNS]
+
+def capture_row(row, columns):
+    # Turn one raw query-log row (list) into a table-captured row (list in FIELDNAMES order)
+    timestamp_i, user_i, club_i, query_i = columns
+    query = row[query_i] if query_i is not None else ''
+    table_info_list = extract_tables(query)  # Returns ((env, table), ...)
+    completeness = is_query_complete(table_info_list)
+    
+    # CHANGE 7: Extract just table names for simplified display
+    simplified_tables = [get_simplified_table_name(table, env) for env, table in table_info_list]
+    
+    # CHANGE 8: Count unique tables used
+    table_used_num = len(simplified_tables)
+    
+    # CHANGE 9: Determine primary data environment (now handles completeness = 0)
+    data_environment = determine_primary_environment(table_info_list, completeness)
+    
+    return [
+        row[timestamp_i] if timestamp_i is not None else '',
+        row[user_i] if user_i is not None else '',
+        row[club_i] if club_i is not None else '',
+        query,
+        ','.join(simplified_tables),
+        completeness,
+        simplified_tables[0] if len(simplified_tables) > 0 else '',
+        simplified_tables[1] if len(simplified_tables) > 1 else '',
+        simplified_tables[2] if len(simplified_tables) > 2 else '',
+        simplified_tables[3] if len(simplified_tables) > 3 else '',
+        simplified_tables[4] if len(simplified_tables) > 4 else '',
+        simplified_tables[5] if len(simplified_tables) > 5 else '',
+        table_used_num,
+        data_environment
+    ]
+
+# Output files use a large write buffer and rows are handed to the csv writer in batches
+# (shared by the scoring step and the runner)
+WRITE_BUFFER_SIZE = 1 << 20
+WRITE_BATCH_ROWS = 4096
+
+def read_chunks(reader):
+    # Split a csv reader into lists of up to WRITE_BATCH_ROWS rows, skipping blank lines
+    rows = filter(None, reader)
+    return iter(lambda: list(islice(rows, WRITE_BATCH_ROWS)), [])
 
 def process_file(input_file, output_file):
     with open(input_file, 'r', newline='', encoding='utf-8') as infile, \
-         open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-        reader = csv.DictReader(infile)
+         open(output_file, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as outfile:
+        reader = csv.reader(infile)
+        columns = capture_columns(next(reader))
         
-        # CHANGE 6: Updated fieldnames with underscore convention and extended to 6 tables
-        fieldnames = ['timestamp_et', 'user', 'club', 'query', 'table_used', 'completeness', 
-                      'first_table_used', 'second_table_used', 'third_table_used', 
-                      'fourth_table_used', 'fifth_table_used', 'sixth_table_used',
-                      'table_used_num', 'data_environment']
+        writer = csv.writer(outfile)
+        writer.writerow(FIELDNAMES)
         
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for row in reader:
-            query = row.get('Query', '')
-            table_info_list = extract_tables(query)  # Now returns [(env, table), ...]
-            completeness = is_query_complete(table_info_list)
-            
-            # CHANGE 7: Extract just table names for simplified display
-            simplified_tables = [get_simplified_table_name(table, env) for env, table in table_info_list]
-            
-            # CHANGE 8: Count unique tables used
-            table_used_num = len(simplified_tables)
-            
-            # CHANGE 9: Determine primary data environment (now handles completeness = 0)
-            data_environment = determine_primary_environment(table_info_list, completeness)
-            
-            new_row = {
-                'timestamp_et': row.get('Timestamp (ET)', ''),
-                'user': row.get('User', ''),
-                'club': row.get('Club', ''),
-                'query': query,
-                'table_used': ','.join(simplified_tables),
-                'completeness': completeness,
-                'first_table_used': simplified_tables[0] if len(simplified_tables) > 0 else '',
-                'second_table_used': simplified_tables[1] if len(simplified_tables) > 1 else '',
-                'third_table_used': simplified_tables[2] if len(simplified_tables) > 2 else '',
-                'fourth_table_used': simplified_tables[3] if len(simplified_tables) > 3 else '',
-                'fifth_table_used': simplified_tables[4] if len(simplified_tables) > 4 else '',
-                'sixth_table_used': simplified_tables[5] if len(simplified_tables) > 5 else '',
-                'table_used_num': table_used_num,
-                'data_environment': data_environment
-            }
-            
-            writer.writerow(new_row)
+        for rows in read_chunks(reader):
+            writer.writerows([capture_row(row, columns) for row in rows])
 
     print(f"Processing complete. Output written to {output_file}")
 
-if __name__ == "__main__":
-    # Set paths relative to script location
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    raw_data_dir = os.path.join(project_root, "raw_data")
-    output_dir = os.path.join(project_root, "curated_output")
-    
+def main(filename):
     # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
-    if len(sys.argv) != 2:
-        print("Usage: python query_table_capture.py <filename>")
-        print("Example: python query_table_capture.py data.csv")
-        sys.exit(1)
+    os.makedirs(CURATED_OUTPUT_DIR, exist_ok=True)
     
-    filename = sys.argv[1]
     if not filename.endswith('.csv'):
         filename += '.csv'
     
-    input_file = os.path.join(raw_data_dir, filename)
-    output_file = os.path.join(output_dir, "query_table_captured.csv")
+    input_file = os.path.join(RAW_DATA_DIR, filename)
+    output_file = os.path.join(CURATED_OUTPUT_DIR, "query_table_captured.csv")
     
     if not os.path.exists(input_file):
         print(f"File not found: {input_file}")
         sys.exit(1)
     
-    process_file(input_file, output_file)
\ No newline at end of file
+    process_file(input_file, output_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python query_table_capture.py <filename>")
+        print("Example: python query_table_capture.py data.csv")
+        sys.exit(1)
+    
+    main(sys.argv[1])
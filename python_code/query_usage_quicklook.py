@@ -13,86 +13,166 @@ business questions about team engagement, platform migration, and table optimiza
 import csv
 import sys
 import os
+import heapq
 from collections import Counter, defaultdict
 
-def analyze_usage(input_file, output_file):
+# Configure paths relative to project structure (resolved once at import)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CURATED_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "curated_output")
+
+class ClubStats:
     """
-    Main analysis function that processes categorized query data and generates
-    club-level and table-level summaries.
+    Per-club usage accumulator.
     
-    Args:
-        input_file (str): Path to categorized_queries.csv from step 2
-        output_file (str): Base path for output files (will generate _club_summary.csv and _table_summary.csv)
+    Uses __slots__ because one instance exists per club and its fields are
+    touched on every query row.
     """
-    # Initialize data structures for tracking club and table metrics
-    club_data = defaultdict(lambda: {
-        'legacy_tables': set(),           # Unique legacy tables used by club
-        'gridiron_tables': set(),         # Unique gridiron tables used by club  
-        'legacy_table_counts': Counter(), # Usage frequency of each legacy table
-        'gridiron_table_counts': Counter(), # Usage frequency of each gridiron table
-        'scores': []                      # All query complexity scores for averaging
-    })
+    __slots__ = ('legacy_table_counts', 'gridiron_table_counts', 'total_score', 'query_count')
+    
+    def __init__(self):
+        self.legacy_table_counts = Counter()   # Usage frequency of each legacy table (keys = unique tables)
+        self.gridiron_table_counts = Counter() # Usage frequency of each gridiron table (keys = unique tables)
+        self.total_score = 0.0                 # Sum of query complexity scores
+        self.query_count = 0                   # Number of queries, for averaging
+
+def new_usage_data():
+    """
+    Create empty club-level and table-level accumulators for update_usage().
+    
+    Returns:
+        tuple: (club_data, table_data) defaultdicts keyed by club / table name
+    """
+    club_data = defaultdict(ClubStats)
     
     table_data = defaultdict(lambda: {
         'unique_clubs': set(),    # Which clubs use this table
         'query_appearances': 0,   # Total times table appears in queries
         'environment': 'unknown'  # legacy/gridiron classification
     })
+    
+    return club_data, table_data
 
-    # Process input data row by row
-    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-        reader = csv.DictReader(infile)
-        for row in reader:
-            club = row.get('club', '').strip()
-            data_env = row.get('data_environment', '').strip()
-            score = row.get('score', '')
-            
-            # Convert score to numeric (handle 'N/A' for incomplete queries)
-            try:
-                numeric_score = float(score) if score != 'N/A' else 0
-            except:
-                numeric_score = 0
-            
-            # Track query scores for club-level analytics
-            if club:
-                club_data[club]['scores'].append(numeric_score)
-            
-            # Process all table columns (supports up to 6 tables per query)
-            table_columns = ['first_table_used', 'second_table_used', 'third_table_used', 
-                           'fourth_table_used', 'fifth_table_used', 'sixth_table_used']
-            
-            for column in table_columns:
-                table = row.get(column, '').strip()
-                if table:
-                    # Update table-level metrics
-                    table_data[table]['unique_clubs'].add(club)
-                    table_data[table]['query_appearances'] += 1
-                    
-                    # Classify table environment (legacy AWS vs new Gridiron)
-                    if data_env in ['legacy', 'gridiron']:
-                        table_data[table]['environment'] = data_env
-                    
-                    # Update club-level table usage tracking
-                    if club and data_env in ['legacy', 'gridiron']:
-                        if data_env == 'legacy':
-                            club_data[club]['legacy_tables'].add(table)
-                            club_data[club]['legacy_table_counts'][table] += 1
-                        elif data_env == 'gridiron':
-                            club_data[club]['gridiron_tables'].add(table)
-                            club_data[club]['gridiron_table_counts'][table] += 1
+def usage_columns(header):
+    """
+    Resolve the positions of the columns update_usage() reads, once per file.
+    
+    Args:
+        header (list): Column names of the categorized query rows
+        
+    Returns:
+        tuple: (club index, data_environment index, score index, list of table column indices);
+               None for a missing club/data_environment/score column, which then reads as '',
+               and missing table columns are left out of the list
+    """
+    table_columns = ['first_table_used', 'second_table_used', 'third_table_used', 
+                     'fourth_table_used', 'fifth_table_used', 'sixth_table_used']
+    club_i, env_i, score_i = (header.index(name) if name in header else None
+                              for name in ('club', 'data_environment', 'score'))
+    return (club_i, env_i, score_i,
+            [header.index(column) for column in table_columns if column in header])
 
-    # Generate outputs
+def update_usage(club_data, table_data, row, columns):
+    """
+    Fold one categorized query row into the club and table accumulators.
+    
+    Args:
+        club_data (dict): Club accumulator from new_usage_data()
+        table_data (dict): Table accumulator from new_usage_data()
+        row (list): Categorized query row (CSV row or in-memory row from step 2)
+        columns (tuple): Column positions from usage_columns()
+    """
+    club_i, env_i, score_i, table_idxs = columns
+    club = row[club_i].strip() if club_i is not None else ''
+    data_env = row[env_i].strip() if env_i is not None else ''
+    score = row[score_i] if score_i is not None else ''
+    
+    # Convert score to numeric (handle 'N/A' for incomplete queries)
+    try:
+        numeric_score = float(score) if score != 'N/A' else 0
+    except:
+        numeric_score = 0
+    
+    # Track query scores for club-level analytics
+    if club:
+        stats = club_data[club]
+        stats.total_score += numeric_score
+        stats.query_count += 1
+    
+    # Environment is constant for the row, so classify it once
+    tracked_env = data_env in ('legacy', 'gridiron')
+    
+    # Process all table columns (supports up to 6 tables per query)
+    tables = [row[table_i] for table_i in table_idxs if row[table_i]]
+    for table in tables:
+        # Update table-level metrics
+        table_stats = table_data[table]
+        table_stats['unique_clubs'].add(club)
+        table_stats['query_appearances'] += 1
+        
+        # Classify table environment (legacy AWS vs new Gridiron)
+        if tracked_env:
+            table_stats['environment'] = data_env
+    
+    # Update club-level table usage tracking, one batch update per row
+    if club and tracked_env:
+        stats = club_data[club]
+        counts = stats.legacy_table_counts if data_env == 'legacy' else stats.gridiron_table_counts
+        counts.update(tables)
+
+def write_usage_outputs(output_file, club_data, table_data):
+    """
+    Write the club-level and table-level summaries for the accumulated usage.
+    
+    Args:
+        output_file (str): Base path for output files (will generate _club_summary.csv and _table_summary.csv)
+        club_data (dict): Club accumulator from new_usage_data()
+        table_data (dict): Table accumulator from new_usage_data()
+        
+    Returns:
+        tuple: (club summary rows, table summary rows) as written by
+               create_club_analysis() and create_table_analysis()
+    """
     base_name = output_file.replace('.csv', '')
     
     # 1st Data Cut: Club Analysis
-    create_club_analysis(f"{base_name}_club_summary.csv", club_data)
+    club_rows = create_club_analysis(f"{base_name}_club_summary.csv", club_data)
     
     # 2nd Data Cut: Table Analysis  
-    create_table_analysis(f"{base_name}_table_summary.csv", table_data)
+    table_rows = create_table_analysis(f"{base_name}_table_summary.csv", table_data)
     
     print(f"Analysis complete. Generated:")
     print(f"  - {base_name}_club_summary.csv")
     print(f"  - {base_name}_table_summary.csv")
+    
+    return club_rows, table_rows
+
+def analyze_usage(input_file, output_file):
+    """
+    Main analysis function that processes categorized query data and generates
+    club-level and table-level summaries.
+    
+    Args:
+        input_file (str): Path to categorized_queries.csv from step 2
+        output_file (str): Base path for output files (will generate _club_summary.csv and _table_summary.csv)
+        
+    Returns:
+        tuple: (club summary rows, table summary rows), see write_usage_outputs()
+    """
+    # Initialize data structures for tracking club and table metrics
+    club_data, table_data = new_usage_data()
+
+    # Process input data row by row
+    with open(input_file, 'r', newline='', encoding='utf-8') as infile:
+        reader = csv.reader(infile)
+        columns = usage_columns(next(reader))
+        for row in reader:
+            if not row:
+                continue  # blank line
+            update_usage(club_data, table_data, row, columns)
+
+    # Generate outputs
+    return write_usage_outputs(output_file, club_data, table_data)
 
 def create_club_analysis(output_file, club_data):
     """
@@ -106,31 +186,39 @@ def create_club_analysis(output_file, club_data):
     Args:
         output_file (str): Path for club summary CSV output
         club_data (dict): Processed club metrics from analyze_usage()
+        
+    Returns:
+        list: The written rows, one per club, in the club summary column order
     """
     with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
         writer = csv.writer(outfile)
         writer.writerow(['club', 'unique_legacy_tables', 'unique_gridiron_tables', 
                         'total_query_score', 'avg_query_score', 'most_used_legacy_table', 'most_used_gridiron_table'])
         
+        rows = []
         for club, data in club_data.items():
-            unique_legacy = len(data['legacy_tables'])
-            unique_gridiron = len(data['gridiron_tables'])
+            unique_legacy = len(data.legacy_table_counts)
+            unique_gridiron = len(data.gridiron_table_counts)
             
             # Calculate engagement metrics
             # Total score = overall engagement volume
             # Average score = analytical sophistication level
-            total_score = sum(data['scores']) if data['scores'] else 0
-            avg_score = total_score / len(data['scores']) if data['scores'] else 0
+            total_score = data.total_score
+            avg_score = total_score / data.query_count if data.query_count else 0
             
             # Identify most frequently used tables by platform
-            most_legacy = data['legacy_table_counts'].most_common(1)
-            most_gridiron = data['gridiron_table_counts'].most_common(1)
-            
-            most_legacy_table = most_legacy[0][0] if most_legacy else ''
-            most_gridiron_table = most_gridiron[0][0] if most_gridiron else ''
+            # (max keeps the first-seen table on ties, same as most_common(1))
+            legacy_counts = data.legacy_table_counts
+            gridiron_counts = data.gridiron_table_counts
+            most_legacy_table = max(legacy_counts, key=legacy_counts.get, default='')
+            most_gridiron_table = max(gridiron_counts, key=gridiron_counts.get, default='')
             
-            writer.writerow([club, unique_legacy, unique_gridiron, f"{total_score:.2f}", f"{avg_score:.2f}", 
-                           most_legacy_table, most_gridiron_table])
+            rows.append([club, unique_legacy, unique_gridiron, f"{total_score:.2f}", f"{avg_score:.2f}", 
+                         most_legacy_table, most_gridiron_table])
+        
+        writer.writerows(rows)
+    
+    return rows
 
 def create_table_analysis(output_file, table_data):
     """
@@ -144,6 +232,10 @@ def create_table_analysis(output_file, table_data):
     Args:
         output_file (str): Path for table summary CSV output  
         table_data (dict): Processed table metrics from analyze_usage()
+        
+    Returns:
+        list: The written rows [table_name, data_environment, unique_clubs_using,
+              total_query_appearances], most queried first
     """
     with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
         writer = csv.writer(outfile)
@@ -154,14 +246,13 @@ def create_table_analysis(output_file, table_data):
                              key=lambda x: x[1]['query_appearances'], 
                              reverse=True)
         
-        for table_name, data in sorted_tables:
-            unique_clubs = len(data['unique_clubs'])
-            appearances = data['query_appearances']
-            environment = data['environment']
-            
-            writer.writerow([table_name, environment, unique_clubs, appearances])
+        table_rows = [[table_name, data['environment'], len(data['unique_clubs']), data['query_appearances']]
+                      for table_name, data in sorted_tables]
+        writer.writerows(table_rows)
+    
+    return table_rows
 
-def print_quick_summary(club_file, table_file):
+def print_quick_summary(club_rows, table_rows):
     """
     Display console summary of key findings for immediate validation.
     
@@ -169,40 +260,29 @@ def print_quick_summary(club_file, table_file):
     the data processing worked correctly before moving to SQL analysis.
     
     Args:
-        club_file (str): Path to club summary CSV
-        table_file (str): Path to table summary CSV
+        club_rows (list): Club summary rows from create_club_analysis()
+        table_rows (list): Table summary rows from create_table_analysis(), most queried first
     """
     print(f"\n📊 QUICK SUMMARY")
     print(f"=" * 40)
     
-    # Top clubs by average score
-    club_scores = []
-    with open(club_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                score = float(row['avg_query_score'])
-                club_scores.append((row['club'], score))
-            except:
-                continue
+    # Top clubs by average score (ranked on the rounded value written to the summary)
+    club_scores = [(row[0], float(row[4])) for row in club_rows]
     
     if club_scores:
-        club_scores.sort(key=lambda x: x[1], reverse=True)
+        top_clubs = heapq.nlargest(5, club_scores, key=lambda x: x[1])
         print(f"\n🏆 Top 5 Clubs by Avg Query Complexity:")
-        for i, (club, score) in enumerate(club_scores[:5], 1):
+        for i, (club, score) in enumerate(top_clubs, 1):
             print(f"{i}. {club}: {score:.2f}")
     
-    # Top tables
+    # Top tables (rows are already sorted by popularity)
     print(f"\n📋 Top 5 Most Popular Tables:")
-    with open(table_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader, 1):
-            if i <= 5:
-                print(f"{i}. {row['table_name']}: {row['total_query_appearances']} uses")
+    for i, (table_name, _, _, appearances) in enumerate(table_rows[:5], 1):
+        print(f"{i}. {table_name}: {appearances} uses")
 
-if __name__ == "__main__":
+def main(input_filename):
     """
-    Command line interface for table usage analysis.
+    Run the table usage analysis on a file in curated_output/.
     
     Usage:
         python table_usage.py categorized_queries.csv
@@ -213,41 +293,43 @@ if __name__ == "__main__":
     Output:
         usage_analysis_club_summary.csv - Club engagement metrics
         usage_analysis_table_summary.csv - Table popularity metrics
-    """
-    # Configure paths relative to project structure
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    curated_output_dir = os.path.join(project_root, "curated_output")
-    
-    # Validate command line arguments
-    if len(sys.argv) != 2:
-        print("Usage: python table_usage.py <input_filename>")
-        print("Example: python table_usage.py categorized_queries.csv")
-        print("\nThis script generates essential data cuts for SQL analysis:")
-        print("  1. Club-level engagement summary")
-        print("  2. Table-level popularity summary")
-        sys.exit(1)
     
+    Args:
+        input_filename (str): Name of the categorized queries file (".csv" optional)
+    """
     # Process input filename
-    input_filename = sys.argv[1]
     if not input_filename.endswith('.csv'):
         input_filename += '.csv'
     
-    input_file = os.path.join(curated_output_dir, input_filename)
-    output_file = os.path.join(curated_output_dir, "usage_analysis.csv")
+    input_file = os.path.join(CURATED_OUTPUT_DIR, input_filename)
+    output_file = os.path.join(CURATED_OUTPUT_DIR, "usage_analysis.csv")
     
     # Validate input file exists
     if not os.path.exists(input_file):
         print(f"Error: File not found: {input_file}")
         print(f"Make sure you've run the categorization step first!")
-        print(f"Expected location: {curated_output_dir}")
+        print(f"Expected location: {CURATED_OUTPUT_DIR}")
         sys.exit(1)
     
     # Execute analysis pipeline
     print(f"🔄 Processing {input_filename}...")
-    analyze_usage(input_file, output_file)
+    club_rows, table_rows = analyze_usage(input_file, output_file)
     
     # Display validation summary
-    base_name = output_file.replace('.csv', '')
-    print_quick_summary(f"{base_name}_club_summary.csv", f"{base_name}_table_summary.csv")
-    print(f"\n✅ Ready for SQL analysis!")
\ No newline at end of file
+    print_quick_summary(club_rows, table_rows)
+    print(f"\n✅ Ready for SQL analysis!")
+
+if __name__ == "__main__":
+    """
+    Command line interface for table usage analysis.
+    """
+    # Validate command line arguments
+    if len(sys.argv) != 2:
+        print("Usage: python table_usage.py <input_filename>")
+        print("Example: python table_usage.py categorized_queries.csv")
+        print("\nThis script generates essential data cuts for SQL analysis:")
+        print("  1. Club-level engagement summary")
+        print("  2. Table-level popularity summary")
+        sys.exit(1)
+    
+    main(sys.argv[1])
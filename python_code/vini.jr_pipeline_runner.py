@@ -4,37 +4,77 @@ Orchestrates the full usage pipeline:
   1. capture tables
   2. score query complexity
   3. analyse usage
+All three steps run in one streaming pass over the raw CSV: each row is
+captured, scored and folded into the usage summaries in memory, so the
+query text is read and parsed once. The intermediate CSVs are still written.
+For large inputs, capture + scoring (the regex-heavy part) runs on worker
+processes chunk by chunk while this process writes and aggregates the
+chunks already finished.
 Usage:
   python vini.jr_pipeline_runner.py NFL_query_test_Jan_June.csv
 """
-import subprocess
+import csv
 import pathlib
 import sys
 import time
 
+from query_table_capture import FIELDNAMES, WRITE_BUFFER_SIZE, capture_columns, capture_row, read_chunks
+from query_categorization import SCORE_FIELDNAMES, categorize_columns, categorize_row, map_chunks, use_worker_pool
+from query_usage_quicklook import new_usage_data, usage_columns, update_usage, write_usage_outputs, print_quick_summary
+
 ROOT = pathlib.Path(__file__).resolve().parent
 RAW_DIR = ROOT.parent / "raw_data"
 OUT_DIR = ROOT.parent / "curated_output"
 OUT_DIR.mkdir(exist_ok=True)
 
-def run(cmd):
-    start = time.time()
-    print(f"→ {cmd}")
-    result = subprocess.run(cmd, shell=True, check=True)
-    print(f"   finished in {time.time()-start:.1f}s")
-    return result
+def capture_and_score_chunk(raw_rows, raw_columns, score_columns):
+    # Worker: steps 1 and 2 for one chunk of raw rows; returns rows in FIELDNAMES + SCORE_FIELDNAMES order
+    return [categorize_row(capture_row(raw_row, raw_columns), score_columns) for raw_row in raw_rows]
 
 def main(raw_file):
+    if not raw_file.endswith('.csv'):
+        raw_file += '.csv'
+
     raw_path = RAW_DIR / raw_file
     captured = OUT_DIR / "query_table_captured.csv"
     scored   = OUT_DIR / "categorized_queries.csv"
     final    = OUT_DIR / "usage_analysis.csv"
-    
-    run(f"python query_table_capture.py {raw_file}")
-    run(f"python query_categorization.py query_table_captured.csv")
-    run(f"python query_usage_quicklook.py categorized_queries.csv")
+
+    if not raw_path.exists():
+        sys.exit(f"File not found: {raw_path}")
+
+    start = time.time()
+    print(f"→ capture, score and analyse {raw_file}")
+    club_data, table_data = new_usage_data()
+
+    with open(raw_path, 'r', newline='', encoding='utf-8') as infile, \
+         open(captured, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as captured_file, \
+         open(scored, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as scored_file:
+        reader = csv.reader(infile)
+        raw_columns = capture_columns(next(reader))
+        scored_fieldnames = FIELDNAMES + SCORE_FIELDNAMES
+        score_columns = categorize_columns(scored_fieldnames)
+        aggregate_columns = usage_columns(scored_fieldnames)
+
+        captured_writer = csv.writer(captured_file)
+        scored_writer = csv.writer(scored_file)
+        captured_writer.writerow(FIELDNAMES)
+        scored_writer.writerow(scored_fieldnames)
+
+        captured_width = len(FIELDNAMES)
+        for rows in map_chunks(capture_and_score_chunk, read_chunks(reader), raw_columns, score_columns,
+                               parallel=use_worker_pool(raw_path)):
+            captured_writer.writerows([row[:captured_width] for row in rows])
+            scored_writer.writerows(rows)
+            for row in rows:
+                update_usage(club_data, table_data, row, aggregate_columns)
+
+    club_rows, table_rows = write_usage_outputs(str(final), club_data, table_data)
+    print(f"   finished in {time.time()-start:.1f}s")
+
+    print_quick_summary(club_rows, table_rows)
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         sys.exit("Usage: python vini.jr_pipeline_runner.py <raw_csv>")
-    main(sys.argv[1])
\ No newline at end of file
+    main(sys.argv[1])